@@ -1,27 +1,94 @@
 """
 Crypto News Scraper - FastAPI Web Service
 Provides REST API endpoint to scrape crypto news with configurable limit
+
+Scrapes requested via /crypto-news run on a Celery worker:
+    celery -A Crypto_api.celery_app worker --concurrency=8
 """
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional
+import os
+import re
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+import msgspec
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import multiprocessing
 import uvicorn
 from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
+import time
+import asyncio
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from celery import Celery
+from celery.result import AsyncResult
+
+
+BASE_URL = "https://crypto.news"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+MAX_ARTICLES = 20
+_BAD_RE = re.compile(r'/(?:category|tag|author|buy-crypto|events|meme-coins)/|#')
+_VALID_URL_PREFIX = BASE_URL + '/'
+_WS = re.compile(r'\s+')
+
+# Only the tags parse_article queries are built into the article tree
+ARTICLE_STRAINER = SoupStrainer(['h1', 'article', 'meta', 'time', 'p'])
+
+# Conditional-GET cache: url -> (etag, last_modified, stored_at, parsed result)
+CACHE: "OrderedDict[str, Tuple[str, str, float, object]]" = OrderedDict()
+CACHE_MAX_ENTRIES = 256
+HOMEPAGE_TTL = 5 * 60        # article list churns
+ARTICLE_TTL = 24 * 60 * 60   # article bodies are effectively immutable
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Article parsing is pure CPU, so the API server runs it outside the GIL in
+# worker processes. Set up by the app lifespan; None elsewhere (Celery workers)
+POOL: Optional[ProcessPoolExecutor] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the article parsing pool for the lifetime of the API server"""
+    global POOL
+    # Not fork: the server process already runs threadpool threads
+    POOL = ProcessPoolExecutor(
+        max_workers=min(4, os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+    try:
+        yield
+    finally:
+        POOL.shutdown()
+        POOL = None
 
 
 app = FastAPI(
     title="Crypto News Scraper API",
     description="Scrape latest crypto news from crypto.news",
     version="1.0.0",
-    root_path="/crypto"
+    root_path="/crypto",
+    lifespan=lifespan
+)
+
+celery_app = Celery('crypto', broker=REDIS_URL, backend=REDIS_URL)
+# Fail fast when Redis is down so enqueueing stays an immediate call
+celery_app.conf.update(
+    broker_connection_timeout=2,
+    task_publish_retry_policy={'max_retries': 2, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5},
+    result_backend_transport_options={
+        'retry_policy': {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5}
+    },
+    redis_socket_connect_timeout=2,
 )
 
 
-class CryptoArticle(BaseModel):
+class CryptoArticle(msgspec.Struct, kw_only=True):
     """Crypto Article model"""
     url: str
     title: str
@@ -31,7 +98,7 @@ class CryptoArticle(BaseModel):
     scraped_at: str
 
 
-class CryptoScrapeResponse(BaseModel):
+class CryptoScrapeResponse(msgspec.Struct, kw_only=True):
     """API response model"""
     success: bool
     articles: List[CryptoArticle]
@@ -40,135 +107,366 @@ class CryptoScrapeResponse(BaseModel):
     message: Optional[str] = None
 
 
-def scrape_crypto_news(limit: int = 3):
+def encode_scrape_response(articles: List[Dict[str, str]]) -> Response:
     """
-    Scrape crypto news from crypto.news - EXACT WORKING CODE from user
+    Encode scraped articles as a CryptoScrapeResponse JSON body
+    
+    The data is produced by the scraper itself, so it is encoded directly
+    with msgspec instead of being revalidated field by field.
+    """
+    
+    body = CryptoScrapeResponse(
+        success=True,
+        articles=[CryptoArticle(**article) for article in articles],
+        count=len(articles),
+        scraped_at=articles[0]['scraped_at'],
+        message=f"Successfully scraped {len(articles)} article(s)"
+    )
+    
+    return Response(content=msgspec.json.encode(body), media_type="application/json")
+
+
+async def fetch_cached(session: aiohttp.ClientSession, url: str, ttl: float, parse: Callable):
+    """
+    GET a URL, revalidating a cached copy with If-None-Match/If-Modified-Since
     
     Args:
-        limit: Number of articles to scrape (1-20)
+        session: Shared aiohttp session
+        url: URL to fetch
+        ttl: Seconds a cached entry may be revalidated before it is refetched
+        parse: Coroutine function turning the response into the cached result
     
     Returns:
-        List of articles or None if error
+        Parsed result, reused from the cache on a 304 response
     """
     
-    base_url = "https://crypto.news"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
+    entry = CACHE.get(url)
+    if entry and time.monotonic() - entry[2] > ttl:
+        del CACHE[url]
+        entry = None
     
-    # Step 1: Get article URLs from homepage
-    article_urls = []
-    try:
-        response = requests.get(base_url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the "latest" section
-        latest_section = None
-        
-        # Strategy 1: Look for heading with "latest" text
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'div']):
-            if heading.get_text().strip().lower() == 'latest':
-                latest_section = heading.find_parent()
-                break
+    request_headers = {}
+    if entry:
+        etag, last_modified, _, _ = entry
+        if etag:
+            request_headers['If-None-Match'] = etag
+        if last_modified:
+            request_headers['If-Modified-Since'] = last_modified
+    
+    async with session.get(url, headers=request_headers) as response:
+        if response.status == 304 and entry:
+            # Still valid: restart the TTL so confirmed entries are kept
+            CACHE[url] = (etag, last_modified, time.monotonic(), entry[3])
+            CACHE.move_to_end(url)
+            return entry[3]
+        parsed = await parse(response)
+        status = response.status
+        etag = response.headers.get('ETag', '')
+        last_modified = response.headers.get('Last-Modified', '')
+    
+    if status == 200 and (etag or last_modified):
+        CACHE[url] = (etag, last_modified, time.monotonic(), parsed)
+        CACHE.move_to_end(url)
+        while len(CACHE) > CACHE_MAX_ENTRIES:
+            CACHE.popitem(last=False)
+    
+    return parsed
+
+
+def _add_article_url(url: Optional[str], article_urls: List[str], seen: set):
+    """Append url to article_urls if it is a new, valid article URL"""
+    
+    if not url:
+        return
+    
+    # Build full URL
+    if url.startswith('/'):
+        url = BASE_URL + url
+    
+    # Filter valid article URLs
+    if (url.startswith(_VALID_URL_PREFIX) and 
+        url.count('/') >= 4 and
+        url not in seen and
+        not _BAD_RE.search(url)):
         
-        # Strategy 2: Look for section/div with class containing "latest"
-        if not latest_section:
-            latest_section = soup.find(['section', 'div'], class_=lambda x: x and 'latest' in x.lower())
+        seen.add(url)
+        article_urls.append(url)
+
+
+def _text(elem) -> str:
+    """Normalized text content of an lxml element"""
+    return ''.join(elem.itertext()).strip().lower()
+
+
+class _LatestSectionScanner:
+    """
+    Locate the homepage "latest" section from incremental parser events
+    
+    Strategy 1 (parent of a heading reading exactly "latest") is resolved
+    while streaming; strategies 2 and 3 are only used once the whole page
+    has been read without a strategy 1 match.
+    
+    A heading's text is only complete at its end tag, so a match is kept
+    pending while its ancestors close. Every ancestor that still reads
+    exactly "latest" is climbed through, and the outermost h1/h2/h3/div
+    among them becomes the match, mirroring the document-order search of
+    the original BeautifulSoup walk.
+    """
+    
+    def __init__(self):
+        self.pending = None
+        self.climb = None
+        self.strategy1 = None
+        self.strategy2 = None
+        self.strategy3 = None
+        self.after_latest_heading = False
+        self.article_urls: List[str] = []
+        self.seen = set()
+    
+    def scan(self, events) -> bool:
+        """
+        Consume (event, element) pairs from an lxml pull parser
         
-        # Strategy 3: Look for articles after "latest" heading
-        if not latest_section:
-            for elem in soup.find_all(['h1', 'h2', 'h3']):
-                if 'latest' in elem.get_text().lower():
-                    latest_section = elem.find_next(['section', 'div', 'article'])
-                    break
+        Returns:
+            True once no further input is needed
+        """
         
-        # Extract article links from latest section
-        if latest_section:
-            for link in latest_section.find_all('a', href=True):
-                url = link['href']
+        for event, elem in events:
+            tag = elem.tag
+            
+            if event == 'start':
+                # Strategy 2: Look for section/div with class containing "latest"
+                if (self.strategy2 is None and tag in ('section', 'div') and
+                        'latest' in elem.get('class', '').lower()):
+                    self.strategy2 = elem
                 
-                # Build full URL
-                if url.startswith('/'):
-                    url = base_url + url
+                # Strategy 3: Look for articles after "latest" heading
+                if (self.after_latest_heading and self.strategy3 is None and
+                        tag in ('section', 'div', 'article')):
+                    self.strategy3 = elem
+                continue
+            
+            if tag in ('script', 'style', 'svg'):
+                # Never queried; free the subtree as soon as it closes
+                elem.clear(keep_tail=True)
+                continue
+            
+            if self.pending is not None:
+                if elem is not self.climb.getparent():
+                    continue
                 
-                # Filter valid article URLs
-                if (base_url in url and 
-                    url.count('/') >= 4 and
-                    url not in article_urls and
-                    not any(x in url for x in ['/category/', '/tag/', '/author/', '#', 
-                                                '/buy-crypto/', '/events/', '/meme-coins/'])):
-                    
-                    article_urls.append(url)
-                    
-                    if len(article_urls) == limit:
-                        break
+                if _text(elem) == 'latest':
+                    self.climb = elem
+                    if tag in ('h1', 'h2', 'h3', 'div'):
+                        self.pending = elem
+                    continue
+                
+                self._resolve_strategy1()
+                return True
+            
+            if tag in ('h1', 'h2', 'h3', 'div'):
+                text = _text(elem)
+                
+                # Strategy 1: Look for heading with "latest" text
+                if text == 'latest':
+                    self.pending = self.climb = elem
+                    continue
+                
+                if tag != 'div' and 'latest' in text:
+                    self.after_latest_heading = True
+        
+        return False
     
-    except Exception as e:
-        raise Exception(f"Network error: {e}")
+    def _resolve_strategy1(self):
+        """Take the pending match's parent, now fully parsed, as the section"""
+        
+        self.strategy1 = self.pending.getparent()
+        for link in self.strategy1.iter('a'):
+            _add_article_url(link.get('href'), self.article_urls, self.seen)
+    
+    def result(self) -> List[str]:
+        """Article URLs from the best section found"""
+        
+        if self.strategy1 is None and self.pending is not None:
+            # Every ancestor up to the root read "latest"
+            if self.pending.getparent() is not None:
+                self._resolve_strategy1()
+        
+        elif self.strategy1 is None:
+            latest_section = self.strategy2 if self.strategy2 is not None else self.strategy3
+            if latest_section is not None:
+                for link in latest_section.iter('a'):
+                    _add_article_url(link.get('href'), self.article_urls, self.seen)
+        
+        return self.article_urls[:MAX_ARTICLES]
+
+
+async def parse_homepage(response: aiohttp.ClientResponse) -> List[str]:
+    """
+    Extract article URLs from the "latest" section of the homepage
     
-    # Check if we found articles
-    if not article_urls:
-        raise Exception("Could not find articles. Website structure may have changed.")
+    The body is streamed into an incremental parser and reading stops as
+    soon as the "latest" section has closed.
     
-    # Step 2: Scrape each article
-    articles = []
+    Args:
+        response: Homepage response
+    
+    Returns:
+        Up to MAX_ARTICLES article URLs
+    """
+    
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    scanner = _LatestSectionScanner()
+    
+    async for chunk in response.content.iter_chunked(8192):
+        parser.feed(chunk)
+        if scanner.scan(parser.read_events()):
+            response.close()
+            return scanner.result()
+    
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        pass
+    scanner.scan(parser.read_events())
+    
+    return scanner.result()
+
+
+def parse_article(url: str, html: bytes) -> Dict[str, str]:
+    """
+    Extract title, content, summary and date from an article page
+    
+    Args:
+        url: Article URL
+        html: Article page body
+    
+    Returns:
+        Article dict without scraped_at
+    """
+    
+    soup = BeautifulSoup(html, 'lxml', parse_only=ARTICLE_STRAINER)
+    
+    # Extract title
+    title = ""
+    h1 = soup.find('h1')
+    if h1:
+        title = h1.get_text(strip=True)
+    
+    # Extract content
+    content_parts = []
+    article_tag = soup.find('article')
+    if article_tag:
+        for p in article_tag.find_all('p'):
+            text = _WS.sub(' ', p.get_text()).strip()
+            if len(text) > 50:
+                content_parts.append(text)
+    
+    content = '\n\n'.join(content_parts)
+    
+    # Extract summary
+    summary = ""
+    meta_desc = soup.find('meta', {'name': 'description'})
+    if meta_desc and meta_desc.get('content'):
+        summary = meta_desc['content']
+    
+    # Extract date
+    date = ""
+    time_tag = soup.find('time')
+    if time_tag:
+        date = time_tag.get('datetime', '') or time_tag.get_text(strip=True)
+    
+    return {
+        'url': url,
+        'title': title,
+        'summary': summary,
+        'content': content,
+        'date': date
+    }
+
+
+async def fetch_article(session: aiohttp.ClientSession, url: str):
+    """
+    Fetch and parse a single article page
+    
+    Args:
+        session: Shared aiohttp session
+        url: Article URL
+    
+    Returns:
+        Article dict without scraped_at
+    """
+    
+    async def parse(response: aiohttp.ClientResponse):
+        html = await response.read()
+        # Free the connector slot before waiting on the pool
+        response.release()
+        
+        # No pool outside the API server (e.g. in Celery workers); parse inline
+        if POOL is None:
+            return parse_article(url, html)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(POOL, parse_article, url, html)
+    
+    return await fetch_cached(session, url, ARTICLE_TTL, parse)
+
+
+async def scrape_crypto_news(limit: int = 3):
+    """
+    Scrape crypto news from crypto.news - EXACT WORKING CODE from user
+    
+    Article pages are fetched concurrently over one pooled session.
+    
+    Args:
+        limit: Number of articles to scrape (1-20)
     
-    for i, url in enumerate(article_urls, 1):
+    Returns:
+        List of articles or None if error
+    """
+    
+    now_iso = datetime.now().isoformat()
+    
+    connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=15)
+    ) as session:
+        
+        # Step 1: Get article URLs from homepage
         try:
-            response = requests.get(url, headers=headers, timeout=15)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract title
-            title = ""
-            h1 = soup.find('h1')
-            if h1:
-                title = h1.get_text(strip=True)
-            
-            # Extract content
-            content_parts = []
-            article_tag = soup.find('article')
-            if article_tag:
-                for p in article_tag.find_all('p'):
-                    text = p.get_text(strip=True)
-                    if len(text) > 50:
-                        content_parts.append(text)
-            
-            content = '\n\n'.join(content_parts)
-            
-            # Extract summary
-            summary = ""
-            meta_desc = soup.find('meta', {'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                summary = meta_desc['content']
-            
-            # Extract date
-            date = ""
-            time_tag = soup.find('time')
-            if time_tag:
-                date = time_tag.get('datetime', '') or time_tag.get_text(strip=True)
-            
-            # Save article data
-            article = {
-                'url': url,
-                'title': title,
-                'summary': summary,
-                'content': content,
-                'date': date,
-                'scraped_at': datetime.now().isoformat()
-            }
-            
-            articles.append(article)
-            
+            article_urls = await fetch_cached(session, BASE_URL, HOMEPAGE_TTL, parse_homepage)
+            article_urls = article_urls[:limit]
+        
         except Exception as e:
+            raise Exception(f"Network error: {e}")
+        
+        # Check if we found articles
+        if not article_urls:
+            raise Exception("Could not find articles. Website structure may have changed.")
+        
+        # Step 2: Scrape all articles concurrently
+        results = await asyncio.gather(
+            *(fetch_article(session, url) for url in article_urls),
+            return_exceptions=True
+        )
+    
+    articles = []
+    
+    for url, result in zip(article_urls, results):
+        if isinstance(result, Exception):
             # Add partial article with error
             articles.append({
                 'url': url,
                 'title': 'Error fetching article',
                 'summary': '',
-                'content': f'Error: {str(e)[:200]}',
+                'content': f'Error: {str(result)[:200]}',
                 'date': '',
-                'scraped_at': datetime.now().isoformat()
+                'scraped_at': now_iso
             })
+        elif result['content']:
+            articles.append({**result, 'scraped_at': now_iso})
     
     # Check if we scraped any articles
     if not articles:
@@ -177,6 +475,12 @@ def scrape_crypto_news(limit: int = 3):
     return articles
 
 
+@celery_app.task(name="Crypto_api.scrape_task")
+def scrape_task(limit: int = 3):
+    """Celery task wrapper around scrape_crypto_news"""
+    return asyncio.run(scrape_crypto_news(limit))
+
+
 @app.get("/", tags=["Info"])
 async def root():
     """API information"""
@@ -184,7 +488,9 @@ async def root():
         "name": "Crypto News Scraper API",
         "version": "1.0.0",
         "endpoints": {
-            "/crypto-news": "GET - Fetch crypto news articles (param: limit=1-20)",
+            "/crypto-news": "GET - Queue a scrape and return its task id (param: limit=1-20)",
+            "/crypto-news/{task_id}": "GET - Fetch the articles of a queued scrape",
+            "/crypto-news/sync": "GET - Fetch crypto news articles directly (param: limit=1-20)",
             "/api-status": "GET - Check API status"
         }
     }
@@ -200,8 +506,47 @@ async def api_status():
     }
 
 
-@app.get("/crypto-news", response_model=CryptoScrapeResponse, tags=["Scraper"])
-async def get_crypto_news(
+@app.get("/crypto-news", tags=["Scraper"])
+def get_crypto_news(
+    request: Request,
+    limit: int = Query(
+        default=3,
+        ge=1,
+        le=20,
+        description="Number of articles to fetch (1-20)"
+    )
+):
+    """
+    Queue a scrape of the latest crypto news articles on the Celery worker
+    
+    Parameters:
+    - **limit**: Number of articles to fetch (1-20, default: 3)
+    
+    Returns:
+    - Task id and the URL to poll for the result
+    """
+    
+    try:
+        result = scrape_task.delay(limit)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": str(e),
+                "message": "Failed to queue the scrape. Check if the task broker is reachable."
+            }
+        )
+    
+    return {
+        "task_id": result.id,
+        "status_url": str(request.url_for("get_crypto_news_result", task_id=result.id))
+    }
+
+
+@app.get("/crypto-news/sync", tags=["Scraper"])
+async def get_crypto_news_sync(
     limit: int = Query(
         default=3,
         ge=1,
@@ -220,15 +565,9 @@ async def get_crypto_news(
     """
     
     try:
-        articles = scrape_crypto_news(limit)
+        articles = await scrape_crypto_news(limit)
         
-        return CryptoScrapeResponse(
-            success=True,
-            articles=articles,
-            count=len(articles),
-            scraped_at=datetime.now().isoformat(),
-            message=f"Successfully scraped {len(articles)} article(s)"
-        )
+        return encode_scrape_response(articles)
         
     except Exception as e:
         raise HTTPException(
@@ -241,6 +580,49 @@ async def get_crypto_news(
         )
 
 
+@app.get("/crypto-news/{task_id}", tags=["Scraper"])
+def get_crypto_news_result(task_id: str):
+    """
+    Fetch the result of a scrape queued via /crypto-news
+    
+    Parameters:
+    - **task_id**: Id returned by /crypto-news
+    
+    Returns:
+    - Task status while pending, otherwise the scraped articles
+    """
+    
+    result = AsyncResult(task_id, app=celery_app)
+    
+    try:
+        state = result.state
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": str(e),
+                "message": "Failed to read the scrape result. Check if the result backend is reachable."
+            }
+        )
+    
+    if state == "FAILURE":
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error": str(result.result),
+                "message": "Failed to scrape articles. Check if the website is accessible."
+            }
+        )
+    
+    if state != "SUCCESS":
+        return {"task_id": task_id, "status": state}
+    
+    return encode_scrape_response(result.result)
+
+
 if __name__ == "__main__":
     print("\n" + "="*60)
     print("Crypto News Scraper API")
@@ -249,6 +631,8 @@ if __name__ == "__main__":
     print("API will be available at: http://localhost:8001")
     print("\nEndpoints:")
     print("  - http://localhost:8001/crypto-news?limit=5")
+    print("  - http://localhost:8001/crypto-news/{task_id}")
+    print("  - http://localhost:8001/crypto-news/sync?limit=5")
     print("  - http://localhost:8001/api-status")
     print("  - http://localhost:8001/docs (Interactive API documentation)")
     print("\n" + "="*60 + "\n")
@@ -0,0 +1,224 @@
+"""
+Tests for the streaming homepage parser and the conditional-GET cache
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import Crypto_api
+from Crypto_api import BASE_URL, fetch_cached, parse_homepage
+
+
+class FakeContent:
+    """Minimal stand-in for aiohttp's StreamReader"""
+
+    def __init__(self, body: bytes, chunk_size: int):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def iter_chunked(self, n):
+        for i in range(0, len(self.body), self.chunk_size):
+            yield self.body[i:i + self.chunk_size]
+
+
+class FakeResponse:
+    """Minimal stand-in for aiohttp's ClientResponse"""
+
+    def __init__(self, body: bytes, chunk_size: int = 8192, status: int = 200, headers=None):
+        self.content = FakeContent(body, chunk_size)
+        self.status = status
+        self.headers = headers or {}
+        self.closed = False
+
+    async def read(self):
+        return self.content.body
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Minimal stand-in for aiohttp's ClientSession serving queued responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    @asynccontextmanager
+    async def get(self, url, headers=None):
+        self.requests.append((url, headers or {}))
+        yield self.responses.pop(0)
+
+
+def page(body: str) -> bytes:
+    return f"<html><head><script>var s = 'latest';</script></head><body>{body}</body></html>".encode()
+
+
+NAV = '<nav><a href="/news/nav-link/">Nav</a></nav>'
+
+LAYOUTS = {
+    # Strategy 1: heading wrapped in a div that also reads "latest"
+    "wrapped": (
+        page(NAV + '<section><div class="hdr"><h2>Latest</h2></div>'
+             '<ul><li><a href="/news/a1/">A1</a></li>'
+             '<li><a href="/news/a2/">A2</a></li></ul></section>'
+             '<a href="/news/after/">After</a>'),
+        ["/news/a1/", "/news/a2/"],
+    ),
+    # Strategy 1: heading inside a non-heading wrapper inside a "latest" div
+    "span-wrapped": (
+        page(NAV + '<section><div><span><h2>Latest</h2></span><script>x()</script></div>'
+             '<a href="/news/a/">A</a></section>'
+             '<a href="/news/after/">After</a>'),
+        ["/news/a/"],
+    ),
+    # Strategy 1: heading directly inside the section
+    "plain": (
+        page(NAV + '<div><a href="/news/a0/">A0</a><h2>Latest</h2>'
+             '<a href="/news/a1/">A1</a><a href="/news/a1/">A1 again</a>'
+             '<a href="/category/markets/">Markets</a><a href="#top">Top</a>'
+             '<svg><path d="M0 0"/></svg><a href="https://crypto.news/news/a2/">A2</a></div>'
+             '<a href="/news/after/">After</a>'),
+        ["/news/a0/", "/news/a1/", "/news/a2/"],
+    ),
+    # Strategy 2: section whose class contains "latest"
+    "class": (
+        page(NAV + '<div class="feed"><a href="/news/other/">Other</a></div>'
+             '<section class="Latest-News"><a href="/news/s1/">S1</a>'
+             '<a href="/tag/btc/">BTC</a><a href="/news/s2/">S2</a></section>'),
+        ["/news/s1/", "/news/s2/"],
+    ),
+    # Strategy 3: first section after a heading mentioning "latest"
+    "next-section": (
+        page(NAV + '<h2>Latest news</h2><section><a href="/news/n1/">N1</a>'
+             '<a href="/author/jane/">Jane</a></section>'
+             '<section><a href="/news/n2/">N2</a></section>'),
+        ["/news/n1/"],
+    ),
+}
+
+
+@pytest.mark.parametrize("chunk_size", [7, 8192])
+@pytest.mark.parametrize("layout", sorted(LAYOUTS))
+def test_parse_homepage_layouts(layout, chunk_size):
+    body, expected = LAYOUTS[layout]
+    response = FakeResponse(body, chunk_size)
+
+    urls = asyncio.run(parse_homepage(response))
+
+    assert urls == [BASE_URL + path for path in expected]
+
+
+def test_parse_homepage_stops_after_latest_section():
+    body, _ = LAYOUTS["wrapped"]
+    response = FakeResponse(body + b"<!--" + b"x" * 100000 + b"-->", 64)
+
+    asyncio.run(parse_homepage(response))
+
+    assert response.closed
+
+
+def test_parse_homepage_without_latest_section():
+    response = FakeResponse(page(NAV), 8192)
+
+    assert asyncio.run(parse_homepage(response)) == []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(Crypto_api.time, "monotonic", clock)
+    monkeypatch.setattr(Crypto_api, "CACHE", Crypto_api.OrderedDict())
+    return clock
+
+
+def fetch(session, url, ttl=60, parsed=None):
+    calls = []
+
+    async def parse(response):
+        calls.append(url)
+        return parsed if parsed is not None else (await response.read()).decode()
+
+    result = asyncio.run(fetch_cached(session, url, ttl, parse))
+    return result, calls
+
+
+def test_fetch_cached_reuses_result_on_304(clock):
+    session = FakeSession(
+        FakeResponse(b"v1", headers={"ETag": '"e1"', "Last-Modified": "Mon"}),
+        FakeResponse(b"", status=304),
+    )
+
+    assert fetch(session, "u") == ("v1", ["u"])
+    assert fetch(session, "u") == ("v1", [])
+    assert session.requests[0][1] == {}
+    assert session.requests[1][1] == {"If-None-Match": '"e1"', "If-Modified-Since": "Mon"}
+
+
+def test_fetch_cached_304_restarts_ttl(clock):
+    session = FakeSession(
+        FakeResponse(b"v1", headers={"ETag": '"e1"'}),
+        FakeResponse(b"", status=304),
+        FakeResponse(b"", status=304),
+    )
+
+    fetch(session, "u", ttl=60)
+    clock.now += 50
+    fetch(session, "u", ttl=60)
+    clock.now += 50
+
+    # 100s after the first download, but only 50s after the last 304
+    assert fetch(session, "u", ttl=60) == ("v1", [])
+    assert session.requests[2][1] == {"If-None-Match": '"e1"'}
+
+
+def test_fetch_cached_expired_entry_is_refetched(clock):
+    session = FakeSession(
+        FakeResponse(b"v1", headers={"ETag": '"e1"'}),
+        FakeResponse(b"v2", headers={"ETag": '"e2"'}),
+    )
+
+    fetch(session, "u", ttl=60)
+    clock.now += 61
+
+    assert fetch(session, "u", ttl=60) == ("v2", ["u"])
+    assert session.requests[1][1] == {}
+    assert Crypto_api.CACHE["u"][0] == '"e2"'
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(b"v1"),
+    FakeResponse(b"v1", status=500, headers={"ETag": '"e1"'}),
+])
+def test_fetch_cached_only_stores_200_with_validators(clock, response):
+    session = FakeSession(response)
+
+    assert fetch(session, "u") == ("v1", ["u"])
+    assert "u" not in Crypto_api.CACHE
+
+
+def test_fetch_cached_evicts_least_recently_used(clock, monkeypatch):
+    monkeypatch.setattr(Crypto_api, "CACHE_MAX_ENTRIES", 2)
+    session = FakeSession(
+        FakeResponse(b"a", headers={"ETag": '"a"'}),
+        FakeResponse(b"b", headers={"ETag": '"b"'}),
+        FakeResponse(b"", status=304),
+        FakeResponse(b"c", headers={"ETag": '"c"'}),
+    )
+
+    fetch(session, "a")
+    fetch(session, "b")
+    fetch(session, "a")  # revalidated, now most recently used
+    fetch(session, "c")
+
+    assert list(Crypto_api.CACHE) == ["a", "c"]